@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn
-from Bio import Phylo
-from io import StringIO
-from pygtex import GeneModel, GenesModel, TissuesInfoModel, GTExAPIError
+import re
+from collections import defaultdict
+from functools import lru_cache
+from pygtex import Model, GeneModel, GenesModel, TissuesInfoModel, GTExAPIError
 from pygtex import GeneExpressionModel, MedianGeneExpressionModel, TopExpressedGeneModel
 
+# splits a Newick formatted tree into delimiters and `name:length` labels
+_newickTokens = re.compile(r'[(),;]|[^(),;]+')
+
+# single precision is plenty for plotting medians and halves the size of the plotted frames
+_plotDtype = np.float32
+
 
 class GTExVisualError(Exception):
     """ Error related to visualization when using pandas, matplotlib, or seaborn."""
@@ -19,19 +25,21 @@ def parseRawTissues(tissues):
     Return a list of `tissueSiteDetailId`s that can be recognized by the API.
     tissues - a list of integers containing tissue indices.
     """
-    tModel = TissuesInfoModel()
-    return [tModel.getTissues('tissueSiteDetailId')[int(id)] for id in tissues]
+    # gathers all requested indices from the id array at once
+    tissueIds = TissuesInfoModel().getTissues('tissueSiteDetailId')
+    return tissueIds[np.asarray(tissues, dtype=int)].tolist()
 
 
 # GeneExpression
 
-def plotGeneExpression(gene, tissueIds, sortBy="ageBracket", kind="bar", title='Gene Expression by Median', figsize=None, rot=None, xlabel='Tissues', ylabel='Median (TPM)'):
+def plotGeneExpression(gene, tissueIds, sortBy="ageBracket", kind="bar", title='Gene Expression by Median', figsize=None, rot=None, xlabel='Tissues', ylabel='Median (TPM)', ax=None):
     """
     gene - a string of gene symbols, versioned gencode Ids, or unversioned gencode Ids.
     tissueIds - a list of tissueSiteDetailIds.
     sortBy - can be 'ageBracket' or 'sex'
     kind - the kind of plot to produce (bar, barh, etc)
     title, figsize, rot, xlabel, ylabel - settings for matplotlib
+    ax - matplotlib axes to draw on; a new figure is created if not given
     """
     gencodeId = GeneModel(gene).getGencodeId()
 
@@ -41,25 +49,24 @@ def plotGeneExpression(gene, tissueIds, sortBy="ageBracket", kind="bar", title='
     geModel = GeneExpressionModel([gencodeId], tissueIds, sortBy)
     expression = geModel.getGeneExpression()
 
-    # sort by tissue, subsetGroup, then median
-    expression.sort(key=lambda item: (item[0], item[3], item[1]))
+    # sort by tissue, subsetGroup, then median; labels are ranked by their sorted factorized codes
+    tissueCodes, _ = pd.factorize(np.array([item[0] for item in expression], dtype=object), sort=True)
+    subsetCodes, _ = pd.factorize(np.array([item[3] for item in expression], dtype=object), sort=True)
+    medians = np.array([item[1] for item in expression], dtype=np.float64)
+    expression = [expression[i] for i in np.lexsort((medians, subsetCodes, tissueCodes))]
 
-    # further parse our data
-    tissues = []
-    data = {}
+    # further parse our data; a dict keeps tissues unique and in order of first appearance
+    tissues = {}
+    data = defaultdict(list)
 
     for tissue, median, n, subsetGroup in expression:
-        if tissue not in tissues:
-            tissues.append(tissue)
-        try:
-            data[subsetGroup].append(median)
-        except KeyError:
-            data[subsetGroup] = [median]
+        tissues.setdefault(tissue, None)
+        data[subsetGroup].append(median)
 
     # convert to pandas DataFrame
-    df = pd.DataFrame(data=data, index=tissues)
+    df = pd.DataFrame(data=data, index=list(tissues), dtype=_plotDtype)
 
-    graph = df.plot(kind=kind, title=title, figsize=figsize, rot=rot)
+    graph = df.plot(kind=kind, title=title, figsize=figsize, rot=rot, ax=ax)
     graph.set(xlabel=xlabel, ylabel=ylabel)
 
 
@@ -70,36 +77,51 @@ def _getMedianGeneExpressionModel(genes, tissueIds):
     Internal function for MedianGeneExpression related visualization.
     Return a MedianGeneExpressionModel object containing the median gene expression data of the given genes and tissues.
     """
-    gencodeIds = GenesModel(genes).getGencodeIds()
+    # lists are not hashable, so the arguments are converted to tuples for the cached lookup
+    return _getCachedMedianGeneExpressionModel(tuple(genes), tuple(tissueIds))
+
+
+@lru_cache(maxsize=32)
+def _getCachedMedianGeneExpressionModel(genes, tissueIds):
+    """
+    Internal function for MedianGeneExpression related visualization.
+    Cached so plotting the same genes and tissues in different ways only fetches the data once.
+    """
+    gencodeIds = GenesModel(list(genes)).getGencodeIds()
 
     if not len(gencodeIds) or not len(tissueIds):
         raise GTExVisualError('Invalid input gene or tissues.')
 
-    return MedianGeneExpressionModel(gencodeIds, tissueIds)
+    return MedianGeneExpressionModel(gencodeIds, list(tissueIds))
+
 
+# the cached models hold fetched data, so they are forgotten along with the rest of the cached API data
+Model.onClearCache(_getCachedMedianGeneExpressionModel.cache_clear)
 
-def plotMedianGeneExpression(genes, tissueIds, kind="bar", title='Median Gene Expression', figsize=None, rot=None, xlabel='Gene', ylabel='Median (TPM)'):
+
+def plotMedianGeneExpression(genes, tissueIds, kind="bar", title='Median Gene Expression', figsize=None, rot=None, xlabel='Gene', ylabel='Median (TPM)', ax=None):
     """
     genes - a list of gene symbols, versioned gencode Ids, or unversioned gencode Ids.
     tissueIds - a list of tissueSiteDetailIds.
     kind - the kind of plot to produce (bar, barh, etc)
     title, figsize, rot, xlabel, ylabel - settings for matplotlib
+    ax - matplotlib axes to draw on; a new figure is created if not given
     """
     mModel = _getMedianGeneExpressionModel(genes, tissueIds)
-    index, data = mModel.getMedianExpression()
-    df = pd.DataFrame(data=data, index=index)
+    df = mModel.getMedianExpressionDF().astype(_plotDtype)
     # df = df.transpose()
 
     # https://pandas.pydata.org/pandas-docs/stable/user_guide/visualization.html
-    plt = df.plot(kind=kind, title=title, figsize=figsize, rot=rot)
-    plt.set(xlabel=xlabel, ylabel=ylabel)
+    graph = df.plot(kind=kind, title=title, figsize=figsize, rot=rot, ax=ax)
+    graph.set(xlabel=xlabel, ylabel=ylabel)
 
 
-def plotMedianGeneExpressionClusters(genes, tissueIds, clusteredBy="tissues"):
+def plotMedianGeneExpressionClusters(genes, tissueIds, clusteredBy="tissues", ax=None):
     """
     genes - a list of gene symbols, versioned gencode Ids, or unversioned gencode Ids.
     tissueIds - a list of tissueSiteDetailIds.
     clusteredBy - can be 'tissues' or 'genes'
+    ax - matplotlib axes to draw on; new frameless axes are created if not given
     """
     mModel = _getMedianGeneExpressionModel(genes, tissueIds)
     if clusteredBy == "genes":
@@ -112,38 +134,127 @@ def plotMedianGeneExpressionClusters(genes, tissueIds, clusteredBy="tissues"):
     if not clusters:
         raise GTExAPIError('Cluster data is not available by {}.'.format(clusteredBy))
 
-    tree = Phylo.read(StringIO(clusters), "newick")
-    # Phylo.draw_ascii(tree)
-    Phylo.draw(tree, axes=plt.axes(frame_on=False, xticks=[], yticks=[]))
+    if ax is None:
+        # imported here since matplotlib is slow to import and only needed when no axes are given
+        import matplotlib.pyplot as plt
+        ax = plt.axes(frame_on=False, xticks=[], yticks=[])
 
+    _drawNewickTree(_parseNewick(clusters), ax)
 
-def plotMedianGeneExpressionHeatmap(genes, tissueIds, figsize=None):
+
+def _parseNewick(newick):
+    """
+    Internal function for cluster visualization.
+    Return the root clade of a Newick formatted tree as nested lists: [name, branchLength, [childClade, ...]].
+    """
+    root = ['', 0.0, []]
+    stack = [root]  # clades whose children are being parsed
+    clade = None  # the clade that was just closed, which a following label belongs to
+    for token in _newickTokens.findall(newick):
+        if token == '(':
+            stack.append(['', 0.0, []])
+            stack[-2][2].append(stack[-1])
+            clade = None
+        elif token == ')':
+            clade = stack.pop()
+        elif token == ',':
+            clade = None
+        elif token != ';' and token.strip():
+            # a label is `name`, `name:length`, or `:length`
+            name, _, length = token.strip().partition(':')
+            if clade is None:
+                clade = ['', 0.0, []]
+                stack[-1][2].append(clade)
+            clade[0], clade[1] = name, float(length or 0)
+    # the outermost parentheses enclose the actual root
+    return root[2][0] if len(root[2]) == 1 else root
+
+
+def _drawNewickTree(root, ax):
+    """
+    Internal function for cluster visualization.
+    Draw a parsed Newick tree onto the given axes as a rectangular cladogram with labeled clades.
+    """
+    from matplotlib.collections import LineCollection
+
+    def descendants(clade):
+        """ Yield every clade below the given clade."""
+        for child in clade[2]:
+            yield child
+            yield from descendants(child)
+
+    # like Bio.Phylo, a tree without branch lengths is drawn with unit length branches instead of collapsing
+    unitLengths = not any(clade[1] for clade in descendants(root))
+
+    def branchLength(clade):
+        """ Return the length of the branch leading to the clade, as it is drawn."""
+        return 1 if unitLengths else clade[1]
+
+    lines = []
+    labels = []
+    leaves = []  # x positions of the leaves, from top to bottom
+
+    def place(clade, x):
+        """ Return the y position of the clade and collect the lines for the subtree drawn from x."""
+        name, _, children = clade
+        x += branchLength(clade)
+        if not children:
+            leaves.append(x)
+            y = len(leaves)
+        else:
+            ys = [place(child, x) for child in children]
+            for child, childY in zip(children, ys):
+                lines.append([(x, childY), (x + branchLength(child), childY)])  # horizontal branch to the child
+            lines.append([(x, ys[0]), (x, ys[-1])])  # vertical line joining the children
+            y = (ys[0] + ys[-1]) / 2
+        if name:  # leaves and named internal clades are labeled
+            labels.append((x, y, name))
+        return y
+
+    place(root, -branchLength(root))  # the root is drawn at x=0
+    xMax = max(leaves + [1e-9])
+
+    ax.add_collection(LineCollection(lines, colors='black'))
+    for x, y, name in labels:
+        ax.text(x, y, ' ' + name, verticalalignment='center')
+    ax.set_xlim(-0.05 * xMax, 1.25 * xMax)
+    ax.set_ylim(len(leaves) + 0.8, 0.2)  # first leaf on top
+    ax.set(xlabel='branch length', ylabel='taxa')
+
+
+def plotMedianGeneExpressionHeatmap(genes, tissueIds, figsize=None, ax=None):
     """
     genes - a list of gene symbols, versioned gencode Ids, or unversioned gencode Ids.
     tissueIds - a list of tissueSiteDetailIds.
     figsize - figure size.
+    ax - matplotlib axes to draw on; the current axes are used if not given
     """
     mModel = _getMedianGeneExpressionModel(genes, tissueIds)
-    index, data = mModel.getMedianExpression()
-    df = pd.DataFrame(data=data, index=index)
+    df = mModel.getMedianExpressionDF().astype(_plotDtype)
+    # imported here since seaborn and matplotlib are slow to import and only needed for this plot
+    import matplotlib.pyplot as plt
+    import seaborn
     if figsize:
         plt.rcParams['figure.figsize'] = figsize  # this updates the default figsize as well
-    seaborn.heatmap(df, cmap='YlGnBu', linewidths=0.5, robust=True, annot=True, square=True)
+    seaborn.heatmap(df, cmap='YlGnBu', linewidths=0.5, robust=True, annot=True, square=True, ax=ax)
 
 
 # TopExpressedGene
 
-def plotTopExpressedGene(tissueId, filterMtGene=False, num=50, kind="bar", title=None, figsize=None, rot=None, xlabel='Genes', ylabel='Median (TPM)'):
+def plotTopExpressedGene(tissueId, filterMtGene=False, num=50, kind="bar", title=None, figsize=None, rot=None, xlabel='Genes', ylabel='Median (TPM)', ax=None):
     """
     tissueIds - a list of tissueSiteDetailIds.
     kind - the kind of plot to produce (bar, barh, etc)
     title, figsize, rot, xlabel, ylabel - settings for matplotlib
+    ax - matplotlib axes to draw on; a new figure is created if not given
     """
     title = title or 'Top Genes Expressed in {} by Median'.format(tissueId)
     teModel = TopExpressedGeneModel(tissueId, filterMtGene=filterMtGene, num=num)
     topExGenes = teModel.getTopGenesInfo()  # dictionary of top expressed genes with their median expression values
-    # sort the dictionary in descending order
-    sortedGenes = {gene: median for gene, median in sorted(topExGenes.items(), key=lambda item: item[1], reverse=True)}
-    df = pd.DataFrame(data=sortedGenes.values(), index=sortedGenes.keys())
-    graph = df.plot(kind=kind, title=title, figsize=figsize, rot=rot, legend=False)
+    genes = np.array(list(topExGenes.keys()), dtype=object)
+    medians = np.fromiter(topExGenes.values(), dtype=_plotDtype, count=len(topExGenes))
+    # sort in descending order; a stable sort keeps tied genes in the order the API returned them
+    order = np.argsort(-medians, kind='stable')
+    df = pd.DataFrame(data=medians[order], index=genes[order])
+    graph = df.plot(kind=kind, title=title, figsize=figsize, rot=rot, legend=False, ax=ax)
     graph.set(xlabel=xlabel, ylabel=ylabel)
@@ -1,49 +1,177 @@
 # !/usr/bin/env python3
 
-import urllib.request as urllib
-import json
-import ssl
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from operator import itemgetter
 import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-ssl._create_default_https_context = ssl._create_unverified_context  # create an SSL certificate to use HTTPS
+try:
+    import orjson as _json  # faster parser for the large expression payloads, if available
+except ImportError:
+    import json as _json
+
+_logger = logging.getLogger(__name__)
+
+# delimiters used to split a Newick formatted cluster into groups of genes, then into individual tokens
+_newickGroupDelimiters = re.compile(r'[()]')
+_newickTokenDelimiters = re.compile(r'[,:]')
+# a versioned or unversioned Ensembl gene id, e.g. ENSG00000130234.10; gene symbols such as ENSA do not match
+_gencodeIdPattern = re.compile(r'ENS[A-Z]*G\d+(\.\d+)?')
+
+
+def _configureSession(session):
+    """ Return the given session set up with pooled, retrying connections that ask the API for JSON."""
+    # only one host is queried, so few host pools are needed, but each pool keeps enough connections for threads
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                          max_retries=Retry(total=3, backoff_factor=0.2)))
+    # compression is left to the requests default (2.26+), which asks for gzip or deflate, and for brotli when a brotli
+    # package is installed, and decompresses the body transparently
+    session.headers.update({'Accept': 'application/json'})
+    return session
 
 
 class Model:
     """
     Represent a data structure encapsulated into its own object that allows interaction with data retreived from an API call.
-    class attributes: baseUrl
-    instance attributes: self.data, self._fetch(url)
+    class attributes: baseUrl, _session, _clearCacheCallbacks
+    static methods: getSession(), enableCache(), clearCache(), onClearCache(), fetchMany()
+    instance attributes: self.data, self.url, self.params, self.load(), self._fetch(url)
     """
     # to be concatenated in later classes to get to desired endpoints
     baseUrl = "https://gtexportal.org/rest/v1/"
-
-    def __init__(self, url):
+    # shared by all models so connections to the API are kept alive and reused across requests
+    _session = _configureSession(requests.Session())
+    # called by clearCache(), so caches kept outside of the models (e.g. by GTExVisuals) are cleared with them
+    _clearCacheCallbacks = []
+    # models are created in large numbers (e.g. one per gene), so instances store attributes in slots instead of a dict
+    __slots__ = ('url', 'params', '_data', '_loaded', '_lock')
+
+    def __init__(self, url, params=None):
         """
         Initializes self.data
-        calls self._fetch with url parameter to populate self.data for use in later methods
-        url - string, required
+        the data is fetched from url by self._fetch on first use, or explicitly with self.load()
+        url - string, required : The endpoint path, relative to baseUrl.
+        params - dictionary, optional : The query parameters sent with the request.
+        """
+        self.url = url
+        self.params = params
+        self._data = None  # raw data fetched from the API
+        self._loaded = False
+        self._lock = threading.Lock()  # held while fetching, so a model shared by threads is only fetched once
+
+    @property
+    def data(self):
+        """ Raw data fetched from the API; the request is made on first access."""
+        self.load()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def load(self):
+        """
+        Fetch the data of this model if it has not been fetched yet, and return the model.
+        A GTExAPIError is thrown when the data could not be fetched.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:  # another thread may have fetched the data while this one was waiting
+                    self._fetch(self.url)  # calls fetch method to populate self.data for each subclass
+                    # only set once every attribute is populated; a failed fetch is retried on the next access
+                    self._loaded = True
+        return self
+
+    def __getstate__(self):
+        """ Return the attributes of the model for pickling and copying, without its lock."""
+        return {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                if name != '_lock' and hasattr(self, name)}
+
+    def __setstate__(self, state):
+        """ Restore the attributes of a pickled or copied model with a new lock."""
+        self._lock = threading.Lock()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @staticmethod
+    def getSession():
+        """ Return the HTTP session shared by all models, e.g. to adjust its headers or to issue related requests."""
+        return Model._session
+
+    @staticmethod
+    def enableCache(cacheName='.gtex_cache', expireAfter=timedelta(days=30)):
         """
-        self.data = None  # raw data fetched from the API
-        self._fetch(url)  # calls fetch method to populate self.data for each subclass
+        Store API responses on disk so repeated queries, even across sessions, are served without a network request.
+        Requires the `requests-cache` package. GTEx reference data only changes between releases.
+        Once a response expires, it is revalidated with a conditional request (If-None-Match / If-Modified-Since),
+        so the body is only downloaded and parsed again if the data actually changed.
+        cacheName - string, optional : Path of the sqlite cache file.
+        expireAfter - timedelta, optional : How long a cached response is reused before it is fetched again.
+        """
+        import requests_cache
+        Model._session = _configureSession(
+            requests_cache.CachedSession(cacheName, backend='sqlite', expire_after=expireAfter))
+
+    @staticmethod
+    def clearCache():
+        """
+        Forget all cached API data: the tissues and genes kept in memory, and the on-disk responses if enableCache() was used.
+        Models that were already fetched keep their data.
+        """
+        TissuesInfoModel._cache.clear()
+        GeneModel._cache.clear()
+        if hasattr(Model._session, 'cache'):  # only a requests_cache.CachedSession has a cache
+            Model._session.cache.clear()
+        for callback in Model._clearCacheCallbacks:
+            callback()
+
+    @staticmethod
+    def onClearCache(callback):
+        """
+        Register a function that is called without arguments whenever clearCache() is called.
+        callback - function, required : Clears a cache that holds models or data derived from them.
+        """
+        Model._clearCacheCallbacks.append(callback)
+
+    @staticmethod
+    def fetchMany(models, maxWorkers=8):
+        """
+        Fetch the data of several independent models concurrently, and return the models in the same order.
+        The first GTExAPIError raised while fetching is re-raised.
+        models - list, required : Models whose data has not been fetched yet.
+        maxWorkers - integer, optional : The number of requests that are made at the same time.
+        """
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futures = [executor.submit(model.load) for model in models]
+        return [future.result() for future in futures]
 
     def _fetch(self, url):
         """
         Sub-classes should override this method to populate `self.data` with its respective data stuctures.
-        This method is intented to be called only once during instantiation.
+        This method is intented to be called only once, by self.load(), and reads and writes `self._data` directly
+        since the model is not marked as loaded until it returns.
         """
         # placeholder for subclasses to override.
         pass
 
-    def _getJsonFromUrl(self, url):
+    def _getJsonFromUrl(self, url, params=None):
         """
-        Return response returned from the input url parsed into python containers, synchronously.
+        Return response returned from the input url and query parameters parsed into python containers, synchronously.
         A GTExAPIError is thrown when the URL is invalid or response is not in json form.
         """
         try:
             # an attempt to read the json formatted data from endpoint url
-            return json.loads(
-                urllib.urlopen(self.baseUrl + url).read()
-            )
+            _logger.debug("GET %s params=%s", url, params)  # formatted only if debug logging is enabled
+            response = self._session.get(self.baseUrl + url, params=params)
+            response.raise_for_status()
+            return _json.loads(response.content)
         except Exception as ex:
             # either failed to fetch data or failed to parse json
             raise GTExAPIError("Failed to fetch from API: " + str(ex)) from ex
@@ -57,6 +185,7 @@ class GTExAPIError(Exception):
 class TissuesInfoModel(Model):
     """
     Represent the dataset retrieved from the `dataset/tissueInfo` endpoint.
+    class attributes: forms
     methods: getTissues(), _fetch()
       {
       tissueInfo: [
@@ -71,6 +200,11 @@ class TissuesInfoModel(Model):
        }, ...
       }
     """
+    # the tissue catalog is static, so it is fetched once and shared by all instances
+    _cache = {}
+    # forms of tissue names that are precomputed into arrays when the catalog is fetched
+    forms = ('tissueSite', 'tissueSiteDetail', 'tissueSiteDetailAbbr', 'tissueSiteDetailId')
+    __slots__ = ('_tissuesByForm',)
 
     def __init__(self):
         """
@@ -80,30 +214,45 @@ class TissuesInfoModel(Model):
 
     def getTissues(self, form):
         """
-        Get a list of tissues in the given form.
+        Get a read-only array of tissues in the given form, which supports indexing by a list of tissue indices.
         form - string, required : 'tissueSite', 'tissueSiteDetail', 'tissueSiteDetailAbbr', or 'tissueSiteDetailId'
         """
-        return [tissue[form] for tissue in self.data]
+        self.load()
+        if form in self._tissuesByForm:
+            return self._tissuesByForm[form]
+        return np.array(list(map(itemgetter(form), self.data)), dtype=object)  # any other field of the catalog
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `dataset/tissueInfo` endpoint."""
         # breaks out of code if self.data is already set
         # (this is the case for all _fetch methods)
-        if self.data:
+        if self._data:
+            return
+        # reuses the tissue catalog if it was already fetched by another instance
+        if url in TissuesInfoModel._cache:
+            self._data, self._tissuesByForm = TissuesInfoModel._cache[url]
             return
         # saves the dataset in the format of a dictionary with data types as keys and the data as values
-        results = self._getJsonFromUrl(url)
+        results = self._getJsonFromUrl(url, self.params)
         if 'tissueInfo' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
         # populating self.data with the value of the tissueInfo data type from the results dictionary
         # this value is a list of dictionaries and each dictionary is a different type of tissue
-        self.data = results['tissueInfo']
+        self._data = results['tissueInfo']
+        # the arrays are shared by all instances, so they are made read-only
+        self._tissuesByForm = {}
+        for form in self.forms:
+            self._tissuesByForm[form] = np.array(list(map(itemgetter(form), self._data)), dtype=object)
+            self._tissuesByForm[form].flags.writeable = False
+        TissuesInfoModel._cache[url] = self._data, self._tissuesByForm
 
 
 class GeneModel(Model):
     """
     Represent the dataset of a SINGLE gene retrieved from the `reference/gene` endpoint.
     Data returned from methods is only for protein coding genes.
+    To look up several genes, prefer GeneModel.batchGet(), which fetches all of them with a single request.
+    static methods: batchGet()
     methods: getGencodeId(), getGeneSymbol(), getEntrezGeneId(), _fetch()
       {"gene":[
        {
@@ -115,13 +264,30 @@ class GeneModel(Model):
        },
       ]
      """
+    # gene metadata does not change within a GTEx release, so each gene is only fetched once
+    _cache = {}
+    __slots__ = ('geneId',)
 
     def __init__(self, geneId):
         """
         geneId - string, required : A gene symbol, versioned gencodeId, or unversioned gencodeId.
         """
         self.geneId = geneId
-        super().__init__(url="reference/gene?format=json&geneId=" + geneId)
+        super().__init__("reference/gene", params={'format': 'json', 'geneId': geneId})
+
+    @staticmethod
+    def batchGet(geneIds):
+        """
+        Return a list of fetched GeneModel objects, one per given gene, using a single request for all of them.
+        geneIds - list, required : A list of gene symbol, versioned gencodeId, or unversioned gencodeId.
+        """
+        missing = [geneId for geneId in geneIds if geneId not in GeneModel._cache]
+        if missing:
+            genes = GenesModel(missing).data
+            # stores each gene where the individual models will look for it
+            for geneId in missing:
+                GeneModel._cache[geneId] = GeneModel._findGene(geneId, genes)
+        return [GeneModel(geneId).load() for geneId in geneIds]
 
     def getGencodeId(self):
         """ Convert input to Genecode ID."""
@@ -137,22 +303,35 @@ class GeneModel(Model):
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `reference/gene` endpoint."""
-        if self.data:
+        if self._data:
+            return
+        # reuses the gene if it was already fetched by another instance
+        if self.geneId in GeneModel._cache:
+            self._data = GeneModel._cache[self.geneId]
             return
-        results = self._getJsonFromUrl(url)  # saves the dataset in the format of a dictionary
+        results = self._getJsonFromUrl(url, self.params)  # saves the dataset in the format of a dictionary
         if 'gene' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
 
-        # should only be one iteration since only one gene is queried
-        for gene in results['gene']:
+        self._data = GeneModel._findGene(self.geneId, results['gene'])
+        GeneModel._cache[self.geneId] = self._data
+
+    @staticmethod
+    def _findGene(geneId, genes):
+        """ Return the protein coding gene from a `reference/gene` response that matches geneId, or None."""
+        # the checks that only depend on geneId are done once, outside of the loop
+        isGencodeId = _gencodeIdPattern.fullmatch(geneId) is not None  # compared without its version, should be unique
+        target = geneId.split('.')[0] if isGencodeId else geneId.lower()
+
+        for gene in genes:
             if gene['geneType'] != 'protein coding':  # skip non protein coding
                 continue  # does not execute following expressions if condition is met
-            if self.geneId.startswith('ENS'):  # gencode Id provided; should be unique
-                self.data = gene  # saves the gene information dictionary and breaks out of loop
-                break
-            elif gene['geneSymbol'].lower() == self.geneId.lower():  # gene symbol uniquely match
-                self.data = gene
-                break  # there might be more, but we break
+            if isGencodeId:
+                if gene['gencodeId'].split('.')[0] == target:
+                    return gene  # returns the gene information dictionary
+            elif gene['geneSymbol'].lower() == target:  # gene symbol uniquely match
+                return gene  # there might be more, but we return the first
+        return None
 
 
 class GenesModel(Model):
@@ -170,51 +349,61 @@ class GenesModel(Model):
       }, ...
       ], ...}
     """
+    __slots__ = ('geneIds', '_gencodeIds', '_geneSymbols', '_entrezGeneIds')
 
     def __init__(self, geneIds):
         """
         geneIds - list, required : A list of gene symbol, versioned gencodeId, or unversioned gencodeId
         """
         self.geneIds = geneIds
-        super().__init__(url="reference/gene?format=json&geneId=" + ','.join(geneIds))
+        super().__init__("reference/gene", params={'format': 'json', 'geneId': ','.join(geneIds)})
 
     def getGencodeIds(self):
         """
         Convert input to Genecode IDs.
         Returns Genecode IDs in list format.
         """
-        return [gene['gencodeId'] for gene in self.data if gene['geneType'] == 'protein coding']
+        self.load()
+        return self._gencodeIds.tolist()
 
     def getGeneSymbols(self):
         """
         Convert input to Gene Symbols.
         Returns Gene Symbols in list format.
         """
-        return [gene['geneSymbol'] for gene in self.data if gene['geneType'] == 'protein coding']
+        self.load()
+        return self._geneSymbols.tolist()
 
     def getEntrezGeneIds(self):
         """
         Convert input to EntrezGene IDs.
         Returns EntrezGene IDs in list format.
         """
-        return [gene['entrezGeneId'] for gene in self.data if gene['geneType'] == 'protein coding']
+        self.load()
+        return self._entrezGeneIds.tolist()
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `reference/gene` endpoint."""
-        if self.data:
+        if self._data:
             return
-        results = self._getJsonFromUrl(url)  # saves the dataset in the format of a dictionary
+        results = self._getJsonFromUrl(url, self.params)  # saves the dataset in the format of a dictionary
         if 'gene' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
         # populating self.data with the value of the gene data type from the results dictionary
         # this value is a list of dictionaries and each dictionary is a different type of gene
-        self.data = results['gene']
+        self._data = results['gene']
+        # filters out non protein coding genes once and stores each field in its own array for the getters
+        proteinCoding = [gene for gene in self._data if gene['geneType'] == 'protein coding']
+        self._gencodeIds = np.array(list(map(itemgetter('gencodeId'), proteinCoding)), dtype=object)
+        self._geneSymbols = np.array(list(map(itemgetter('geneSymbol'), proteinCoding)), dtype=object)
+        self._entrezGeneIds = np.array(list(map(itemgetter('entrezGeneId'), proteinCoding)), dtype=object)
 
 
 class GeneExpressionModel(Model):
     """
     Represent the dataset retrieved from the `expression/geneExpression` endpoint.
     Methods: getGeneExpression(), _fetch()
+    The expression values of each tissue are stored as a numpy array.
       {
         "geneExpression":[{
           "data":[22.97,22.1,15.52, ...],
@@ -226,6 +415,7 @@ class GeneExpressionModel(Model):
         }, ...
       ]}
     """
+    __slots__ = ()
 
     def __init__(self, gencodeIds, tissueSiteDetailIds=None, sortBy=None):
         """
@@ -233,40 +423,55 @@ class GeneExpressionModel(Model):
         tissueSiteDetailId: list, optional : A list of tissue ID of the tissue of interest.
         sortBy: string, optional : 'sex' or 'ageBracket'
         """
-        url = "expression/geneExpression?datasetId=gtex_v8&format=json&gencodeId=" + ','.join(gencodeIds)
-        # checks if this list exists and concatenates tissues to url for API query
+        params = {'datasetId': 'gtex_v8', 'format': 'json', 'gencodeId': ','.join(gencodeIds)}
+        # checks if this list exists and adds tissues to the API query
         if tissueSiteDetailIds:
-            url += "&tissueSiteDetailId=" + ','.join(tissueSiteDetailIds)
-        # checks if this string exists and concatenates it to url for API query
+            params['tissueSiteDetailId'] = ','.join(tissueSiteDetailIds)
+        # checks if this string exists and adds it to the API query
         if sortBy:
-            url += "&attributeSubset=" + sortBy
-        super().__init__(url)
+            params['attributeSubset'] = sortBy
+        super().__init__("expression/geneExpression", params)
 
     def getGeneExpression(self):
         """ Return a list of tuples with format [(tissueSiteDetailId, median, n, subsetGroup), ...]."""
+        # concatenates the data of every tissue into a single array so all medians are computed in one pass
+        lengths = np.fromiter((tissue['data'].size for tissue in self.data), dtype=np.int64, count=len(self.data))
+        groups = np.repeat(np.arange(len(self.data)), lengths)
+        values = np.concatenate([tissue['data'] for tissue in self.data] or [np.empty(0)])
+        # sorts the values within each tissue, then picks the middle element(s) of every tissue
+        values = values[np.lexsort((values, groups))]
+        offsets = np.cumsum(lengths) - lengths
+        nonEmpty = lengths > 0  # 0 median if data is empty
+        lower = (offsets + (lengths - 1) // 2)[nonEmpty]
+        upper = (offsets + lengths // 2)[nonEmpty]
+        medians = np.zeros(len(self.data))
+        medians[nonEmpty] = (values[lower] + values[upper]) / 2
+
         return [(tissue['tissueSiteDetailId'],
-                 # uses numpy to calculate the median since only full dataset is given
-                 np.median(tissue['data'] or [0]),  # 0 median if data is empty
-                 len(tissue['data']),
+                 median,
+                 n,
                  tissue.get('subsetGroup', None))  # store subsets as well for sorting
-                for tissue in self.data]
+                for tissue, median, n in zip(self.data, medians, lengths.tolist())]
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `expression/geneExpression` endpoint."""
-        if self.data:
+        if self._data:
             return
-        results = self._getJsonFromUrl(url)  # saves dictionary of all data retrieved from API query
+        results = self._getJsonFromUrl(url, self.params)  # saves dictionary of all data retrieved from API query
         if 'geneExpression' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
         # populating self.data with the value of the geneExpression data type from the results dictionary
         # this value is a list of dictionaries and each dictionary is a different type of gene
-        self.data = results['geneExpression']
+        self._data = results['geneExpression']
+        # converts the expression values of each tissue to an array once, instead of on every computation
+        for tissue in self._data:
+            tissue['data'] = np.fromiter(tissue['data'], dtype=np.float64, count=len(tissue['data']))
 
 
 class MedianGeneExpressionModel(Model):
     """
     Represent the dataset retrieved from the `expression/medianGeneExpression` endpoint.
-    methods: getMedianExpression(), getGeneCluster(), getTissueCluster(), _fetch()
+    methods: getMedianExpression(), getMedianExpressionDF(), getGeneCluster(), getTissueCluster(), _fetch()
       {
       clusters: {
         gene: "**Newick format**",
@@ -283,17 +488,24 @@ class MedianGeneExpressionModel(Model):
        }, ...
       ]}
     """
+    __slots__ = ('_clusters',)
 
     def __init__(self, gencodeIds, tissueSiteDetailIds):
         """
         gencodeIds - list, required : A list of versioned GENCODE ID of a gene, e.g. ['ENSG00000065613.9.', '...']
         tissueSiteDetailIds - list, required : A list of tissue ID of the tissue of interest.
         """
-        self.clusters = None  # clusters could be None
+        self._clusters = None  # clusters could be None
+
+        params = {'hcluster': 'true', 'pageSize': 10000,
+                  'gencodeId': ','.join(gencodeIds), 'tissueSiteDetailId': ','.join(tissueSiteDetailIds)}
+        super().__init__("expression/medianGeneExpression", params)
 
-        url = "expression/medianGeneExpression?hcluster=true&pageSize=10000&gencodeId={}&tissueSiteDetailId={}" \
-            .format(','.join(gencodeIds), ','.join(tissueSiteDetailIds))
-        super().__init__(url)
+    @property
+    def clusters(self):
+        """ Cluster data for genes and tissues in Newick format, or None; the request is made on first access."""
+        self.load()
+        return self._clusters
 
     def getGenesCluster(self):
         """ Return a cluster based on genes in Newick format."""
@@ -312,38 +524,40 @@ class MedianGeneExpressionModel(Model):
     def getMedianExpression(self):
         """
         Return two containers: ordered genes and medians in a dictionary of lists: [Gene1, Gene2], {"Tissue1": [1,2], ...}.
+        Medians are aligned with the genes; a gene without data in a tissue has a NaN median.
         """
-        genes = []
-        medians = {}
-
-        for entry in self.data:
-            # appends gene symbols to genes list
-            if entry['geneSymbol'] not in genes:
-                genes.append(entry['geneSymbol'])
-
-            # From lecture 14
-            try:  # attempts to add median to an existing entry list
-                medians[entry['tissueSiteDetailId']].append(entry['median'])
-            except KeyError:  # if there is no such list then a new key, value pair is created
-                medians[entry['tissueSiteDetailId']] = [entry['median']]
+        df = self.getMedianExpressionDF()
+        return df.index.tolist(), {tissue: df[tissue].tolist() for tissue in df.columns}
 
-        return genes, medians
+    def getMedianExpressionDF(self):
+        """
+        Return a pandas DataFrame of medians with genes as rows and tissues as columns, in the order they first appear.
+        A gene without data in a tissue has a NaN median.
+        """
+        records = pd.DataFrame(self.data, columns=['geneSymbol', 'tissueSiteDetailId', 'median'])
+        # numbers genes and tissues in the order they first appear
+        geneCodes, genes = pd.factorize(records['geneSymbol'])
+        tissueCodes, tissues = pd.factorize(records['tissueSiteDetailId'])
+        # scatters every median into its (gene, tissue) cell of the table in a single vectorized write
+        table = np.full((len(genes), len(tissues)), np.nan)
+        table[geneCodes, tissueCodes] = records['median'].to_numpy(dtype=np.float64)
+        return pd.DataFrame(table, index=genes.tolist(), columns=tissues.tolist())
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `expression/medianGeneExpression` endpoint."""
-        if self.data:
+        if self._data:
             return
         # saves the dataset in the format of a dictionary with data types as keys and the data as values
-        results = self._getJsonFromUrl(url)
+        results = self._getJsonFromUrl(url, self.params)
         if 'medianGeneExpression' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
         # populating self.data with the value of the medianGeneExpression data type from the results dictionary
         # this value is a list of dictionaries and each dictionary is a different type of gene with associated tissue
-        self.data = results['medianGeneExpression']
+        self._data = results['medianGeneExpression']
         # populating self.clusters with the value of cluster data type from the results dictionary
         # this value is a dictionary with information on the cluster data for either genes or tissues
         if 'clusters' in results:
-            self.clusters = results['clusters']
+            self._clusters = results['clusters']
 
 
 class TopExpressedGeneModel(Model):
@@ -363,6 +577,7 @@ class TopExpressedGeneModel(Model):
           }, ...
       }
     """
+    __slots__ = ('_mediansByGencodeId', '_mediansByGeneSymbol')
 
     def __init__(self, tissueSiteDetailId, filterMtGene=False, num=100):
         """
@@ -370,24 +585,20 @@ class TopExpressedGeneModel(Model):
         filterMtGene - boolean, optional : Flag specifying whether or not to filter out mitochondrial genes.
         num - integer, optional : A number of genes that will be fetched from the top expressed list.
         """
-        url = "expression/topExpressedGene?datasetId=gtex_v8&tissueSiteDetailId={}".format(tissueSiteDetailId)
+        params = {'datasetId': 'gtex_v8', 'tissueSiteDetailId': tissueSiteDetailId}
         if filterMtGene:
-            url += "&filterMtGene=true"
-        url += "&sortBy=median&sortDirection=desc&pageSize={}".format(num)
+            params['filterMtGene'] = 'true'
+        params.update({'sortBy': 'median', 'sortDirection': 'desc', 'pageSize': num})
 
-        super().__init__(url)
+        super().__init__("expression/topExpressedGene", params)
 
     def isTopExpressedGene(self, geneSymbol, gencodeId=None):
         """ Return a boolean denoting the given gencodeId is or is not top expressed in the tissue of interest."""
-        for gene in self.data:  # checks for a matching gene identifier in each gene information dictionary
-            # gencodeId is prioritized if given.
-            if gencodeId:
-                if gene['gencodeId'] == gencodeId:
-                    return gene['median']  # the median of the gene is returned if found
-            else:
-                if gene['geneSymbol'] == geneSymbol:
-                    return gene['median']
-        return False  # if nothing is returned in iteration then False is returned
+        self.load()
+        # gencodeId is prioritized if given.
+        if gencodeId:
+            return self._mediansByGencodeId.get(gencodeId, False)  # the median of the gene is returned if found
+        return self._mediansByGeneSymbol.get(geneSymbol, False)
 
     def getTopGenesInfo(self):
         """ Return a list of dictionary with gene symbols as keys and their median expression as the value. """
@@ -400,15 +611,19 @@ class TopExpressedGeneModel(Model):
 
     def _fetch(self, url):
         """ Overridden method from parent to fetch data from the `expression/topExpressedGene` endpoint."""
-        if self.data:
+        if self._data:
             return
         # saves the dataset in the format of a dictionary with data types as keys and the data as values
-        results = self._getJsonFromUrl(url)
+        results = self._getJsonFromUrl(url, self.params)
         if 'topExpressedGene' not in results:
             raise GTExAPIError('Invalid data from API: ', results)
         # populating self.data with the value of the topExpressedGene data type from the results dictionary
         # this value is a list of dictionaries and each dictionary is a different type of gene
-        self.data = results['topExpressedGene']
+        self._data = results['topExpressedGene']
+        # indexes the medians by gene identifier for constant time lookups;
+        # built in reverse so the first gene wins if an identifier is repeated
+        self._mediansByGencodeId = {gene['gencodeId']: gene['median'] for gene in reversed(self._data)}
+        self._mediansByGeneSymbol = {gene['geneSymbol']: gene['median'] for gene in reversed(self._data)}
 
 
 def getSimilarExpression(gencodeGenes, tissues):
@@ -419,28 +634,22 @@ def getSimilarExpression(gencodeGenes, tissues):
     tissues - lists within a list, required: valid tissue IDs for tissues desired each tissue has to be its own list
     """
     similarExpressionDict = {}
+    # resolves every gene symbol with a single request instead of one request per clustered gene
+    genesModel = GenesModel(gencodeGenes)
+    geneSymbols = dict(zip(genesModel.getGencodeIds(), genesModel.getGeneSymbols()))
     # creates objects for tissues separately to obtain more accurate clusters
-    for tissue in tissues:
+    # the requests are independent, so they are fetched concurrently
+    medianGeneObjs = Model.fetchMany([MedianGeneExpressionModel(gencodeGenes, tissue) for tissue in tissues])
+
+    for tissue, medianGeneObj in zip(tissues, medianGeneObjs):
         # obtaining the clusters
-        medianGeneObj = MedianGeneExpressionModel(gencodeGenes, tissue)
         rawNewickFormat = medianGeneObj.getGenesCluster()
         # creating a new entry for the similarExpressionDict
         similarExpressionDict[tissue[0]] = []
-        # splitting the given cluster string into identifiable genes
-        for item1 in rawNewickFormat.split("("):
-            firstList = item1.split(")")
-            for item2 in firstList:
-                secondList = item2.split(",")
-                finalListSet = set()  # set will represent clustered genes
-                # in the final list all the items clustered together will be in the same list as a proper gene
-                for item3 in secondList:
-                    finalList = item3.split(":")
-                    for gene in finalList:
-                        # translating the genecode ID to the gene symbol while filtering out invalid strings
-                        if gene in gencodeGenes:
-                            geneObj = GeneModel(gene)
-                            geneSymbol = geneObj.getGeneSymbol()
-                            finalListSet.add(geneSymbol)
-                if finalListSet:  # clustered genes are appended to list of relative clusters within a tissue
-                    similarExpressionDict[tissue[0]].append(finalListSet)
+        # splitting the given cluster string on parentheses; genes clustered together share a segment
+        for segment in _newickGroupDelimiters.split(rawNewickFormat):
+            # translating the genecode ID to the gene symbol while filtering out invalid strings
+            finalListSet = {geneSymbols[gene] for gene in _newickTokenDelimiters.split(segment) if gene in geneSymbols}
+            if finalListSet:  # clustered genes are appended to list of relative clusters within a tissue
+                similarExpressionDict[tissue[0]].append(finalListSet)
     return similarExpressionDict
@@ -9,7 +9,11 @@ setup(name='pyGTEx',
           'pandas',
           'matplotlib',
           'seaborn',
-          'biopython'
+          'requests>=2.26'  # the first version that asks for brotli when a brotli package is installed
       ],
+      extras_require={
+          'cache': ['requests-cache'],
+          'fast': ['orjson', 'brotli']
+      },
       py_modules=['pygtex', 'GTExVisuals']
       )
@@ -1,6 +1,6 @@
 # !/usr/bin/env python3
 
-from pygtex import GeneModel, GenesModel, TissuesInfoModel, GTExAPIError
+from pygtex import Model, GeneModel, GenesModel, TissuesInfoModel, GTExAPIError
 from pygtex import GeneExpressionModel, MedianGeneExpressionModel, TopExpressedGeneModel
 
 # TissuesInfoModel
@@ -15,6 +15,12 @@ print("GencodeIds:", ','.join(gModel.getGencodeIds()))
 print("EntrezGeneIds:", ','.join(str(id) for id in gModel.getEntrezGeneIds()))
 
 
+# GeneModel
+# ENSA is a gene symbol, not a gencode Id
+for gene in GeneModel.batchGet(['ace2', 'ENSA', 'ENSG00000130234.10']):
+    print("{:<20}GeneSymbol={},	GencodeId={}".format(gene.geneId, gene.getGeneSymbol(), gene.getGencodeId()))
+
+
 # GeneExpressionModel
 geModel = GeneExpressionModel(
     gencodeIds=['ENSG00000186318.16'], 
@@ -38,6 +44,7 @@ model = MedianGeneExpressionModel(
 print(model.getGenesCluster())
 print(model.getTissuesCluster())
 print(model.getMedianExpression())
+print(model.getMedianExpressionDF())
 
 
 # TopExpressedGeneModel
@@ -45,3 +52,8 @@ tegModel = TopExpressedGeneModel('Esophagus_Gastroesophageal_Junction', 20)
 print(tegModel.isTopExpressedGene(geneSymbol='MT-ND3'))
 print(tegModel.isTopExpressedGene('ENSG00000130234.10'))
 
+
+# Model
+# independent models are fetched concurrently
+tModel, gModel = Model.fetchMany([TissuesInfoModel(), GenesModel(['ace2', 'ENSA'])])
+print(len(tModel.getTissues('tissueSiteDetailId')), ','.join(gModel.getGeneSymbols()))